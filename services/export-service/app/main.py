@@ -1,16 +1,23 @@
 from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 from pydantic import BaseModel
 import google.generativeai as genai
-from typing import Any, Dict, Optional
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from collections import OrderedDict
 import os
+import logging
+import logging.handlers
+import queue
 import tempfile
 import shutil
 import subprocess
 import json
+import re
+import hashlib
 import asyncio
 import httpx
+import orjson
 from pathlib import Path
 from dotenv import load_dotenv
 from openai import OpenAI
@@ -19,7 +26,23 @@ BASE_DIR = Path(__file__).resolve().parent
 ROOT_DIR = BASE_DIR.parent
 load_dotenv(ROOT_DIR / ".env")
 
-app = FastAPI(title="Incorta Chart Assistant Export Service", version="1.0.0")
+logger = logging.getLogger(__name__)
+
+# JSON object in a ```json fenced block, or anywhere in the text as a fallback
+_JSON_FENCE = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL)
+_JSON_RAW = re.compile(r'\{.*\}', re.DOTALL)
+
+# Built .inc files served by /download
+DOWNLOAD_DIR = Path("downloads")
+
+# Pristine create-incorta-component project, copied for each export
+SKELETON_DIR = Path(os.getenv("SKELETON_DIR", "/var/cache/incorta-skeleton"))
+
+app = FastAPI(
+    title="Incorta Chart Assistant Export Service",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 # Configure CORS
 app.add_middleware(
@@ -34,6 +57,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Log records are handed to a queue and written by a background thread,
+# so request handlers never block on stdout
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_log_handler: Optional[logging.handlers.QueueHandler] = None
+
+@app.on_event("startup")
+async def start_logging():
+    global _log_listener, _log_handler
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _log_listener = logging.handlers.QueueListener(log_queue, handler)
+    _log_listener.start()
+    _log_handler = logging.handlers.QueueHandler(log_queue)
+    logger.addHandler(_log_handler)
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+@app.on_event("shutdown")
+async def stop_logging():
+    global _log_listener, _log_handler
+    # Detach first so nothing is queued after the listener stops draining
+    if _log_handler is not None:
+        logger.removeHandler(_log_handler)
+        _log_handler = None
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+    logger.propagate = True
+
 class ChartConfig(BaseModel):
     type: str
     title: str
@@ -64,10 +117,50 @@ class ChatResponse(BaseModel):
     chartConfig: Optional[Dict[str, Any]] = None
     success: bool = True
 
+@app.on_event("startup")
+async def create_download_dir():
+    DOWNLOAD_DIR.mkdir(exist_ok=True)
+
+@app.on_event("startup")
+async def prepare_skeleton():
+    """Create the component skeleton once so exports only need a copy"""
+    if (SKELETON_DIR / "node_modules").is_dir():
+        logger.info("Using cached component skeleton at %s", SKELETON_DIR)
+        return
+    # Scaffold into a private sibling and swap it into place, so other
+    # workers never see (and a crash never leaves) a half-installed skeleton
+    staging_dir = SKELETON_DIR.with_name(f"{SKELETON_DIR.name}.tmp-{os.getpid()}")
+    try:
+        SKELETON_DIR.parent.mkdir(parents=True, exist_ok=True)
+        await run_create_incorta_component(staging_dir)
+        if not (staging_dir / "node_modules").is_dir():
+            raise Exception("node_modules missing from skeleton")
+        try:
+            os.replace(staging_dir, SKELETON_DIR)
+        except OSError:
+            if not (SKELETON_DIR / "node_modules").is_dir():
+                raise
+            # Another worker finished first; use its skeleton
+        logger.info("Created component skeleton at %s", SKELETON_DIR)
+    except Exception as e:
+        # Exports fall back to running npx per request
+        logger.warning("Failed to prepare component skeleton: %s", e)
+    finally:
+        if staging_dir.exists():
+            await asyncio.to_thread(shutil.rmtree, staging_dir, ignore_errors=True)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "export-service"}
+    return {
+        "status": "healthy",
+        "service": "export-service",
+        "builds": {
+            "limit": build_limiter.size,
+            "running": build_limiter.running,
+            "queued": build_limiter.queued,
+        },
+    }
 
 
 @app.post("/chat/process", response_model=ChatResponse)
@@ -77,21 +170,22 @@ async def process_chat(request: ChatRequest):
     """
     try:
         # Before LLM: request a data sample from preview over WS if sessionId provided
-        # effective_context = request.dataContext
+        effective_context = None
         if request.sessionId:
             try:
                 effective_context = await request_data_sample(request.sessionId)
-                print(f"no exception happened")
+                logger.debug("Received data sample for session '%s'", request.sessionId)
             except Exception:
-                effective_context = request.dataContext
-        print(f"effective_context: {effective_context}")
-        print(f"request.prompt: {request.prompt}")
+                effective_context = None
+        if effective_context is None:
+            effective_context = intern_sample(request.dataContext)
+        logger.debug("effective_context: %r", effective_context)
+        logger.debug("request.prompt: %s", request.prompt)
         # Call LLM with user prompt and data context (possibly the preview-provided sample)
         llm_response = await call_llm(request.prompt, effective_context)
-        # print(f"llm_response: {llm_response}")
         # Broadcast LLM response via WebSocket to the session, if provided
-        print(f"request.sessionId: {request.sessionId}")
-        print(f"llm_response: {llm_response}")
+        logger.debug("request.sessionId: %s", request.sessionId)
+        logger.debug("llm_response: %r", llm_response)
         if request.sessionId and llm_response:
             await manager.broadcast_to_session(
                 request.sessionId,
@@ -106,7 +200,7 @@ async def process_chat(request: ChatRequest):
                     },
                 },
             )
-            print(f"broadcasted to session: {request.sessionId}")
+            logger.debug("broadcasted to session: %s", request.sessionId)
         # Optional: also try to send to preview app HTTP endpoint (best-effort)
         # if llm_response.get("chartInstructions"):
         #     await send_to_preview_app(llm_response["chartInstructions"])
@@ -133,7 +227,8 @@ async def export_project(request: ExportRequest):
     """
     try:
         # Create temporary directory for the project
-        with tempfile.TemporaryDirectory() as temp_dir:
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+        try:
             project_path = Path(temp_dir) / request.projectName
             
             # Create the component using create-incorta-component
@@ -143,28 +238,27 @@ async def export_project(request: ExportRequest):
             await update_component(project_path, request.chartConfig)
             
             # Build the component
-            build_result = await build_component(project_path)
+            build_result = await build_limiter.submit(project_path)
             
             if not build_result:
                 raise HTTPException(status_code=500, detail="Failed to build component")
             
             # Find the generated .inc file
-            inc_file = find_inc_file(project_path)
+            inc_file = await asyncio.to_thread(find_inc_file, project_path)
             
             if not inc_file:
                 raise HTTPException(status_code=500, detail="No .inc file generated")
             
-            # Copy to a permanent location for download
-            download_dir = Path("downloads")
-            download_dir.mkdir(exist_ok=True)
-            
-            download_file = download_dir / f"{request.projectName}.inc"
-            shutil.copy2(inc_file, download_file)
+            # Move to a permanent location for download
+            await asyncio.to_thread(finalize_inc_file, inc_file, request.projectName)
             
             return ExportResponse(
                 success=True,
                 downloadUrl=f"/download/{request.projectName}.inc"
             )
+        finally:
+            # Removing the project tree (incl. node_modules) can take a while
+            await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
             
     except Exception as e:
         return ExportResponse(
@@ -175,7 +269,7 @@ async def export_project(request: ExportRequest):
 @app.get("/download/{filename}")
 async def download_file(filename: str):
     """Download the generated .inc file"""
-    file_path = Path("downloads") / filename
+    file_path = DOWNLOAD_DIR / filename
     
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
@@ -191,110 +285,209 @@ async def get_data_sample(data_context: Dict[str, Any]):
     """Get the data sample"""
     return {"data": data_context}
 
+# ------------------ Data Samples ------------------
+class DataSample(NamedTuple):
+    """Interned data context, serialized once for prompts and cache keys"""
+    digest: bytes
+    payload: Dict[str, Any]
+    serialized: str
+
+SAMPLE_INTERN_SIZE = 64
+# content hash -> interned sample
+_samples: "OrderedDict[bytes, DataSample]" = OrderedDict()
+
+def intern_sample(payload: Optional[Dict[str, Any]]) -> Optional[DataSample]:
+    """Return the shared DataSample for payload, or None if there is no data"""
+    if not payload:
+        return None
+    # Hash the key-sorted form so equal samples share an entry, but keep
+    # the payload's own column order in the prompt
+    try:
+        canonical = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits, which orjson can't encode
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    digest = hashlib.blake2b(canonical, digest_size=16).digest()
+    sample = _samples.get(digest)
+    if sample is not None:
+        _samples.move_to_end(digest)
+        return sample
+
+    try:
+        serialized = orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode()
+    except orjson.JSONEncodeError:
+        serialized = json.dumps(payload, indent=2)
+    sample = DataSample(digest, payload, serialized)
+    _samples[digest] = sample
+    if len(_samples) > SAMPLE_INTERN_SIZE:
+        _samples.popitem(last=False)
+    return sample
+
 # ------------------ WebSocket Session Manager ------------------
 class ConnectionManager:
     def __init__(self) -> None:
         # session_id -> set of websockets
         self.active_sessions: Dict[str, set[WebSocket]] = {}
-        # session_id -> latest sample payload
-        self.latest_sample: Dict[str, Any] = {}
-        # session_id -> list of futures waiting for sample
-        self.sample_waiters: Dict[str, list[asyncio.Future]] = {}
-
-    async def connect(self, session_id: str, websocket: WebSocket) -> None:
+        # session_id -> latest interned sample
+        self.latest_sample: Dict[str, Optional[DataSample]] = {}
+        # session_id -> future waiting for the in-flight sample request
+        self.sample_waiters: Dict[str, asyncio.Future] = {}
+        # websockets that asked for JSON in binary frames
+        self.binary_clients: set[WebSocket] = set()
+
+    async def connect(self, session_id: str, websocket: WebSocket, binary: bool = False) -> None:
         await websocket.accept()
         if session_id not in self.active_sessions:
             self.active_sessions[session_id] = set()
         self.active_sessions[session_id].add(websocket)
-        print(f"WS CONNECT: Client connected to session '{session_id}'. Total clients: {len(self.active_sessions[session_id])}")
+        if binary:
+            self.binary_clients.add(websocket)
+        logger.info("WS CONNECT: Client connected to session '%s'. Total clients: %d", session_id, len(self.active_sessions[session_id]))
 
     def disconnect(self, session_id: str, websocket: WebSocket) -> None:
+        self.binary_clients.discard(websocket)
         try:
             if session_id in self.active_sessions and websocket in self.active_sessions[session_id]:
                 self.active_sessions[session_id].remove(websocket)
-                print(f"WS DISCONNECT: Client removed from session '{session_id}'. Remaining clients: {len(self.active_sessions.get(session_id, []))}")
+                logger.info("WS DISCONNECT: Client removed from session '%s'. Remaining clients: %d", session_id, len(self.active_sessions.get(session_id, [])))
             if session_id in self.active_sessions and not self.active_sessions[session_id]:
                 del self.active_sessions[session_id]
-                print(f"WS DISCONNECT: Session '{session_id}' closed.")
+                logger.info("WS DISCONNECT: Session '%s' closed.", session_id)
         except Exception as e:
-            print(f"WS DISCONNECT ERROR: {e}")
+            logger.error("WS DISCONNECT ERROR: %s", e)
 
     async def broadcast_to_session(self, session_id: str, message: Dict[str, Any]) -> None:
         if session_id not in self.active_sessions or not self.active_sessions[session_id]:
-            print(f"WS BROADCAST: No active clients in session '{session_id}' to send to.")
+            logger.info("WS BROADCAST: No active clients in session '%s' to send to.", session_id)
             return
         
         websockets = list(self.active_sessions[session_id])
-        print(f"WS BROADCAST: Sending to {len(websockets)} client(s) in session '{session_id}'.")
+        logger.debug("WS BROADCAST: Sending to %d client(s) in session '%s'.", len(websockets), session_id)
+        # Encode once and send to all clients concurrently; binary clients get
+        # the orjson bytes as-is, text clients need them decoded
+        data = orjson.dumps(message)
+        text = None
+        sends = []
         for ws in websockets:
-            try:
-                await ws.send_json(message)
-            except Exception as e:
-                print(f"WS BROADCAST ERROR: Failed to send to a client in session '{session_id}': {e}")
-                # Best-effort; drop broken sockets
-                self.disconnect(session_id, ws)
+            if ws in self.binary_clients:
+                sends.append(ws.send_bytes(data))
+            else:
+                if text is None:
+                    text = data.decode()
+                sends.append(ws.send_text(text))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        failed = set()
+        for ws, result in zip(websockets, results):
+            if isinstance(result, Exception):
+                logger.warning("WS BROADCAST ERROR: Failed to send to a client in session '%s': %s", session_id, result)
+                failed.add(ws)
+        
+        # Best-effort; drop broken sockets in one pass
+        if failed and session_id in self.active_sessions:
+            self.active_sessions[session_id] -= failed
+            self.binary_clients -= failed
+            if not self.active_sessions[session_id]:
+                del self.active_sessions[session_id]
+                logger.info("WS DISCONNECT: Session '%s' closed.", session_id)
 
 
 manager = ConnectionManager()
 
 
 @app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    await manager.connect(session_id, websocket)
+async def websocket_endpoint(websocket: WebSocket, session_id: str, frames: str = "text"):
+    # Clients connecting with ?frames=binary receive JSON in binary frames
+    await manager.connect(session_id, websocket, binary=frames == "binary")
     try:
         while True:
-            message = await websocket.receive_json()
-            print(f"WS MESSAGE RECEIVED from session '{session_id}': {message}")
+            # Samples can be large; parse with orjson rather than stdlib json.
+            # Binary-frame clients may reply in binary frames too
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            message = orjson.loads(frame.get("bytes") or frame.get("text"))
+            logger.debug("WS MESSAGE RECEIVED from session '%s': %r", session_id, message)
             
             # Preview responds with data sample
             if isinstance(message, dict) and message.get("type") == "DATA_SAMPLE_RESPONSE":
-                payload = message.get("payload")
-                manager.latest_sample[session_id] = payload
-                # notify any waiters
-                if session_id in manager.sample_waiters:
-                    waiters = manager.sample_waiters.pop(session_id)
-                    for fut in waiters:
-                        if not fut.done():
-                            fut.set_result(payload)
+                sample = intern_sample(message.get("payload"))
+                manager.latest_sample[session_id] = sample
+                # notify the waiter, if any
+                fut = manager.sample_waiters.pop(session_id, None)
+                if fut is not None and not fut.done():
+                    fut.set_result(sample)
     except WebSocketDisconnect:
-        print(f"WS DISCONNECT: Session '{session_id}' disconnected normally")
+        logger.info("WS DISCONNECT: Session '%s' disconnected normally", session_id)
         manager.disconnect(session_id, websocket)
     except Exception as e:
-        print(f"WS ERROR: Session '{session_id}' error: {e}")
+        logger.error("WS ERROR: Session '%s' error: %s", session_id, e)
         manager.disconnect(session_id, websocket)
 
 async def create_component(project_path: Path, project_name: str):
     """Create a new Incorta component"""
     try:
-        process = await asyncio.create_subprocess_exec(
-            "npx", "create-incorta-component", "new", str(project_path),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            raise Exception(f"Failed to create component: {stderr.decode()}")
-            
+        if (SKELETON_DIR / "node_modules").is_dir():
+            await asyncio.to_thread(copy_skeleton, project_path, project_name)
+        else:
+            await run_create_incorta_component(project_path)
     except Exception as e:
         raise Exception(f"Error creating component: {str(e)}")
 
+async def run_create_incorta_component(project_path: Path):
+    """Run create-incorta-component to scaffold a project"""
+    process = await asyncio.create_subprocess_exec(
+        "npx", "create-incorta-component", "new", str(project_path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    
+    stdout, stderr = await process.communicate()
+    
+    if process.returncode != 0:
+        raise Exception(f"Failed to create component: {stderr.decode()}")
+
+def link_or_copy(src: str, dst: str):
+    """Hardlink src to dst, copying when they are on different filesystems"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def copy_skeleton(project_path: Path, project_name: str):
+    """Copy the cached skeleton to project_path, hardlinking node_modules"""
+    shutil.copytree(
+        SKELETON_DIR, project_path, symlinks=True,
+        ignore=shutil.ignore_patterns("node_modules"),
+    )
+    # Dependencies are never modified in place, so they can share inodes
+    # with the skeleton; project sources are real copies since they get rewritten
+    shutil.copytree(
+        SKELETON_DIR / "node_modules", project_path / "node_modules",
+        symlinks=True, copy_function=link_or_copy,
+    )
+
+    package_file = project_path / "package.json"
+    if package_file.exists():
+        with open(package_file) as f:
+            package = json.load(f)
+        package["name"] = project_name
+        with open(package_file, 'w') as f:
+            json.dump(package, f, indent=2)
+
 async def update_component(project_path: Path, chart_config: ChartConfig):
     """Update the component with chart configuration"""
     try:
         # Read the main component file
         main_component_file = project_path / "src" / "index.tsx"
         
-        if not main_component_file.exists():
+        if not await asyncio.to_thread(main_component_file.exists):
             raise Exception("Main component file not found")
         
         # Generate the chart component code
         chart_code = generate_chart_component(chart_config)
         
         # Write the updated component
-        with open(main_component_file, 'w') as f:
-            f.write(chart_code)
+        await asyncio.to_thread(main_component_file.write_text, chart_code, encoding='utf-8')
             
     except Exception as e:
         raise Exception(f"Error updating component: {str(e)}")
@@ -317,6 +510,40 @@ async def build_component(project_path: Path):
     except Exception as e:
         return False
 
+# ------------------ Build Concurrency ------------------
+MAX_CONCURRENT_BUILDS = min(os.cpu_count() or 1, 4)
+
+class BuildLimiter:
+    """Caps concurrent component builds and counts running and waiting ones"""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        # builds currently running / waiting for a free slot
+        self.running = 0
+        self.queued = 0
+        # created on first use so it binds to the server's event loop
+        self._sema: Optional[asyncio.Semaphore] = None
+
+    async def submit(self, project_path: Path) -> bool:
+        if self._sema is None:
+            self._sema = asyncio.Semaphore(self.size)
+        if self._sema.locked():
+            logger.info("BUILD QUEUE: %d build(s) waiting for %d slot(s)", self.queued + 1, self.size)
+        self.queued += 1
+        try:
+            await self._sema.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            return await build_component(project_path)
+        finally:
+            self.running -= 1
+            self._sema.release()
+
+
+build_limiter = BuildLimiter(MAX_CONCURRENT_BUILDS)
+
 def find_inc_file(project_path: Path) -> Optional[Path]:
     """Find the generated .inc file"""
     dist_dir = project_path / "dist"
@@ -324,14 +551,31 @@ def find_inc_file(project_path: Path) -> Optional[Path]:
     if not dist_dir.exists():
         return None
     
-    for file in dist_dir.glob("*.inc"):
-        return file
+    with os.scandir(dist_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(".inc") and entry.is_file():
+                return Path(entry.path)
     
     return None
 
+def finalize_inc_file(inc_file: Path, project_name: str) -> Path:
+    """Move the built .inc file out of the temp dir into downloads (blocking)"""
+    download_file = DOWNLOAD_DIR / f"{project_name}.inc"
+    try:
+        # Same filesystem: atomic rename, no data copied
+        os.replace(inc_file, download_file)
+    except OSError:
+        # Cross-device; copy the data only, the temp dir is removed anyway
+        shutil.copyfile(inc_file, download_file)
+    return download_file
+
 def generate_chart_component(chart_config: ChartConfig) -> str:
     """Generate the React component code for the chart"""
-    highcharts_config = json.dumps(chart_config.highchartsConfig, indent=2)
+    try:
+        highcharts_config = orjson.dumps(chart_config.highchartsConfig, option=orjson.OPT_INDENT_2).decode()
+    except orjson.JSONEncodeError:
+        # e.g. integers beyond 64 bits, which orjson can't encode
+        highcharts_config = json.dumps(chart_config.highchartsConfig, indent=2)
     
     return f''' import React from 'react';
                 import {{ useQuery }} from '@incorta-org/component-sdk';
@@ -363,45 +607,36 @@ def generate_chart_component(chart_config: ChartConfig) -> str:
                 export default ChartComponent;
             '''
 
-async def request_data_sample(session_id: str, timeout_seconds: int = 5) -> Dict[str, Any]:
+async def request_data_sample(session_id: str, timeout_seconds: int = 5) -> Optional[DataSample]:
     """Ask the preview app for a data sample over WS and wait for reply."""
-    print(f"DATA SAMPLE REQUEST: Requesting sample from session '{session_id}'")
+    logger.debug("DATA SAMPLE REQUEST: Requesting sample from session '%s'", session_id)
     
-    # prepare waiter
-    fut: asyncio.Future = asyncio.get_event_loop().create_future()
-    manager.sample_waiters.setdefault(session_id, []).append(fut)
+    # prepare waiter; concurrent requests for a session share one future
+    fut = manager.sample_waiters.get(session_id)
+    if fut is None or fut.done():
+        fut = asyncio.get_running_loop().create_future()
+        manager.sample_waiters[session_id] = fut
     
     # broadcast request
     await manager.broadcast_to_session(session_id, {"type": "DATA_SAMPLE_REQUEST"})
     
     try:
-        result = await asyncio.wait_for(fut, timeout=timeout_seconds)
-        print(f"DATA SAMPLE RESPONSE: Received sample from session '{session_id}'")
-        return result or {}
+        # shield so one caller timing out doesn't cancel the shared future
+        result = await asyncio.wait_for(asyncio.shield(fut), timeout=timeout_seconds)
+        logger.debug("DATA SAMPLE RESPONSE: Received sample from session '%s'", session_id)
+        return result
     except asyncio.TimeoutError:
-        print(f"DATA SAMPLE TIMEOUT: No response from session '{session_id}' in {timeout_seconds}s, using cached sample")
+        # Leave the future registered: other callers may still be waiting on
+        # it, and a late reply or the next request will replace it
+        logger.warning("DATA SAMPLE TIMEOUT: No response from session '%s' in %ss, using cached sample", session_id, timeout_seconds)
         # fallback to latest cached sample if any
-        return manager.latest_sample.get(session_id, {})
+        return manager.latest_sample.get(session_id)
 
-async def call_llm(prompt: str, data_context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    """
-    Call LLM with prompt and data context
-    """
-    # You'll need to set your OpenRouter API key in environment
-    api_key = os.getenv("OPENROUTER_API_KEY")
-    print(f"api_key: {api_key}")
-    if not api_key:
-        raise ValueError("OPENROUTER_API_KEY environment variable not set")
-    
-    # Format data context for LLM
-    context_str = ""
-    if data_context:
-        context_str = f"Data Context: {json.dumps(data_context, indent=2)}"
-    
-    system_prompt = f"""
+# System prompt template; {context} is replaced with the data context
+_SYSTEM_PROMPT = """
 You are an expert data visualization assistant with deep knowledge of data analysis patterns and visualization best practices.
 
-{context_str}
+{context}
 
 ## Your Task
 Analyze the data structure (headers, column types, relationships) and user request to provide intelligent visualization recommendations.
@@ -481,12 +716,83 @@ Respond with JSON containing:
 
 Remember: You design the visualization experience, the system handles the format conversion.
 """
+
+# ------------------ LLM Response Cache ------------------
+# hash of prompt + data context -> parsed LLM response
+LLM_CACHE_SIZE = 512
+_llm_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def llm_cache_key(prompt: str, data_context: Optional[DataSample]) -> str:
+    """Stable hash of an LLM request"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(prompt.encode())
+    h.update(b"\0")
+    if data_context is not None:
+        h.update(data_context.digest)
+    return h.hexdigest()
+
+async def call_llm(prompt: str, data_context: Optional[DataSample] = None) -> Dict[str, Any]:
+    """
+    Call LLM with prompt and data context, reusing the response for repeated requests
+    """
+    key = llm_cache_key(prompt, data_context)
+    llm_response = _llm_cache.get(key)
+    if llm_response is not None:
+        _llm_cache.move_to_end(key)
+        return llm_response
+
+    content = await query_llm(prompt, data_context)
+    llm_response = parse_llm_content(content)
+    if llm_response is None:
+        # Not cached, so the next identical request asks the model again
+        return {"explanation": content, "chartInstructions": None}
+
+    _llm_cache[key] = llm_response
+    if len(_llm_cache) > LLM_CACHE_SIZE:
+        _llm_cache.popitem(last=False)
+    return llm_response
+
+# Lazily created LLM clients, shared across calls and rebuilt when the
+# API key changes: (api_key, client)
+_gemini_model: Optional[Tuple[str, genai.GenerativeModel]] = None
+_openrouter_client: Optional[Tuple[str, OpenAI]] = None
+
+def get_gemini_model(api_key: str) -> genai.GenerativeModel:
+    """Configure Gemini and create the model on first use"""
+    global _gemini_model
+    if _gemini_model is None or _gemini_model[0] != api_key:
+        genai.configure(api_key=api_key)
+        _gemini_model = (api_key, genai.GenerativeModel('gemini-2.5-flash-lite-preview-06-17'))
+    return _gemini_model[1]
+
+def get_openrouter_client(api_key: str) -> OpenAI:
+    """Create the OpenRouter client on first use"""
+    global _openrouter_client
+    if _openrouter_client is None or _openrouter_client[0] != api_key:
+        _openrouter_client = (api_key, OpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=api_key,
+        ))
+    return _openrouter_client[1]
+
+async def query_llm(prompt: str, data_context: Optional[DataSample] = None) -> str:
+    """
+    Call LLM with prompt and data context, returning the raw completion text
+    """
+    # You'll need to set your OpenRouter API key in environment
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        raise ValueError("OPENROUTER_API_KEY environment variable not set")
+    
+    # Format data context for LLM
+    context_str = ""
+    if data_context:
+        context_str = f"Data Context: {data_context.serialized}"
+    
+    system_prompt = _SYSTEM_PROMPT.format_map({"context": context_str})
     use_gemini = False
     try:
-        # client = OpenAI(
-        #     base_url="https://openrouter.ai/api/v1",
-        #     api_key=api_key,
-        # )
+        # client = get_openrouter_client(api_key)
 
         # response = client.chat.completions.create(
         #     model="deepseek/deepseek-r1:free",
@@ -496,10 +802,7 @@ Remember: You design the visualization experience, the system handles the format
         #     ],
         # )
         if use_gemini:
-            genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-
-            # Initialize the model
-            model = genai.GenerativeModel('gemini-2.5-flash-lite-preview-06-17')
+            model = get_gemini_model(os.environ["GEMINI_API_KEY"])
 
             # Generate content
             chat = model.start_chat(history=[
@@ -507,13 +810,9 @@ Remember: You design the visualization experience, the system handles the format
                 {'role': 'model', 'parts': [prompt]},
             ])
             response = chat.send_message(prompt)
-            # Print the response
-            print(response.text)
-        # Debug (optional):
-        # print(response)
-        # print("no llm call")
+            logger.debug("Gemini response: %s", response.text)
     except Exception as e:
-        print(f"Error calling LLM: {e}")
+        logger.error("Error calling LLM: %s", e)
         raise HTTPException(status_code=500, detail=f"LLM API error: {e}")
 
     # Extract content from SDK response
@@ -585,24 +884,42 @@ Remember: You design the visualization experience, the system handles the format
 '''
     except Exception:
         content = ""
-    print(f"content: {content}")
-    # Parse JSON response if present, else return explanation-only
+    logger.debug("content: %r", content)
+    return content
+
+def parse_llm_content(content: str) -> Optional[Dict[str, Any]]:
+    """Extract the JSON response from LLM output, or None if there is none"""
     try:
-        import re
         # Try to extract JSON from markdown code blocks first
-        markdown_json_match = re.search(r'```json\s*(\{.*?\})\s*```', content, re.DOTALL)
+        markdown_json_match = _JSON_FENCE.search(content)
         if markdown_json_match:
             json_content = markdown_json_match.group(1)
         else:
             # Fallback to raw JSON extraction
-            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            json_match = _JSON_RAW.search(content)
             json_content = json_match.group() if json_match else None
         
         if json_content:
             return json.loads(json_content)
-        return {"explanation": content, "chartInstructions": None}
+        return None
     except json.JSONDecodeError:
-        return {"explanation": content, "chartInstructions": None}
+        return None
+
+# Shared client so preview notifications reuse pooled connections
+preview_client: Optional[httpx.AsyncClient] = None
+
+@app.on_event("startup")
+async def open_preview_client():
+    global preview_client
+    preview_client = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20),
+    )
+
+@app.on_event("shutdown")
+async def close_preview_client():
+    if preview_client is not None:
+        await preview_client.aclose()
 
 async def send_to_preview_app(chart_instructions: Dict[str, Any]):
     """
@@ -610,17 +927,15 @@ async def send_to_preview_app(chart_instructions: Dict[str, Any]):
     """
     preview_app_url = "http://localhost:8000/api/chart/update"
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                preview_app_url,
-                json=chart_instructions,
-                timeout=10.0
-            )
-            print(f"Sent to preview app: {response.status_code}")
-        except Exception as e:
-            print(f"Failed to send to preview app: {e}")
-            # Don't fail the main request if preview app is down
+    try:
+        response = await preview_client.post(
+            preview_app_url,
+            json=chart_instructions
+        )
+        logger.debug("Sent to preview app: %s", response.status_code)
+    except Exception as e:
+        logger.warning("Failed to send to preview app: %s", e)
+        # Don't fail the main request if preview app is down
 
 if __name__ == "__main__":
     import uvicorn